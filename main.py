@@ -1,10 +1,74 @@
 import os
 import json
+import math
+import pickle
+import hashlib
 import argparse
+try:
+    import orjson
+except ImportError:  # optional: faster JSON output
+    orjson = None
 from src.ingestion import chunk_file_with_unstructured
-from src.analysis import analyze_chunks_against_policy_all_sections
+from src import analysis
+from src.analysis import analyze_chunks_against_policy_all_sections, prepare_policies
 from src.policy_generator import generate_policy_from_chunks, save_policy_json
 
+def _all_finite(obj):
+    # orjson writes NaN / Infinity as null, which would not load back as a float
+    if isinstance(obj, float):
+        return math.isfinite(obj)
+    if isinstance(obj, dict):
+        return all(map(_all_finite, obj.values()))
+    if isinstance(obj, (list, tuple)):
+        return all(map(_all_finite, obj))
+    return True
+
+def write_json(obj, path):
+    # orjson serializes the (sections x policies) report much faster than json.dump.
+    # The bytes are built before the file is opened, so a value orjson rejects
+    # (e.g. an int beyond 64 bits) falls back to json.dump instead of leaving
+    # an empty file behind
+    if orjson is not None and _all_finite(obj):
+        try:
+            data = orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+        except orjson.JSONEncodeError:
+            pass  # e.g. non-str keys or >64-bit ints; json.dump handles those
+        else:
+            with open(path, 'wb') as f:
+                f.write(data)
+            return
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(obj, f, indent=2)
+
+def _prepare_code_digest():
+    # prepare_policy, policy_kind and the CHECK_* numbering all live in
+    # src/analysis.py, so any edit there invalidates pickled prepared policies
+    with open(analysis.__file__, 'rb') as f:
+        return hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+
+def _load_policies(path='policies.json', cache_path='policies.pkl'):
+    # Prepared policies are pickled next to policies.json and reused only while
+    # the JSON has exactly the size / mtime recorded in the pickle and the
+    # preparing code is unchanged
+    st = os.stat(path)
+    source = (st.st_size, st.st_mtime_ns)
+    code = _prepare_code_digest()
+    try:
+        with open(cache_path, 'rb') as f:
+            cached = pickle.load(f)
+        if cached.get('source') == source and cached.get('code') == code:
+            return cached['policies']
+    except Exception:
+        pass
+    with open(path, 'r', encoding='utf-8') as f:
+        policy = prepare_policies(json.load(f))
+    try:
+        with open(cache_path, 'wb') as f:
+            pickle.dump({'source': source, 'code': code, 'policies': policy}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    except OSError as e:
+        print("Warning: could not write policy cache:", e)
+    return policy
+
 def display_report(report):
     print('\n' + '='*60)
     print(' LEGAL RISK ANALYSIS REPORT (ALL SECTIONS)')
@@ -24,6 +88,7 @@ def main():
     parser.add_argument('--generate-policies', '-g', action='store_true', help='Generate policies from the contract using AI agent (or fallback).')
     parser.add_argument('--append-policies', '-a', action='store_true', help='Append generated policies to policies.json (requires review recommended).')
     parser.add_argument('--use-model', action='store_true', help='Use external LLM for generation (you must implement call_model in policy_generator).')
+    parser.add_argument('--workers', '-w', type=int, default=1, help='Number of processes for the per-section analysis (default: 1).')
     args = parser.parse_args()
 
     input_file = args.input
@@ -56,23 +121,21 @@ def main():
                     "importance": float(r.get('importance', 1.0))
                 }
                 existing.append(mapped)
-            with open('policies.json', 'w', encoding='utf-8') as f:
-                json.dump(existing, f, indent=2)
+            write_json(existing, 'policies.json')
             print("Appended generated rules to policies.json (please review).")
         return
 
     # Else run the analyzer using existing policies.json
     try:
-        policy = json.load(open('policies.json','r', encoding='utf-8'))
+        policy = _load_policies()
     except Exception as e:
         print("ERROR: could not load policies.json:", e)
         return
 
     print("➡ Running analysis across all sections...")
-    report = analyze_chunks_against_policy_all_sections(chunks, policy)
+    report = analyze_chunks_against_policy_all_sections(chunks, policy, workers=args.workers)
     os.makedirs('output', exist_ok=True)
-    with open('output/report.json','w', encoding='utf-8') as f:
-        json.dump(report, f, indent=2)
+    write_json(report, 'output/report.json')
     display_report(report)
 
 if __name__ == '__main__':
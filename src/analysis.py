@@ -1,235 +1,555 @@
-import json, re
-from typing import List, Dict, Any
-from src.models import RiskCheck
+import json, re, functools
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Dict, Any, Optional, Tuple
+import numpy as np
 
 # Severity weights
 RISK_WEIGHTS = {'LOW': 0.2, 'MEDIUM': 0.5, 'HIGH': 1.0}
+# Checks report risk as an index into these; labels are only used in the report
+RISK_LOW, RISK_MEDIUM, RISK_HIGH = range(3)
+_RISK_LABELS = ('LOW', 'MEDIUM', 'HIGH')
+_RISK_WEIGHTS_T = tuple(RISK_WEIGHTS[label] for label in _RISK_LABELS)
+_RISK_WEIGHT_ARRAY = np.array(_RISK_WEIGHTS_T)
 
-def local_rule_check(clause_name: str, policy_rule: str, relevant_text: str) -> RiskCheck:
-    # Basic deterministic checks for demo purposes
-    txt = (relevant_text or '').lower()
-    clause = clause_name
+# Numeric facts used by the deterministic checks: a duration in years and a
+# liability multiplier ("1.5x", "2 times"). One alternation finds both; the two
+# alternatives cannot match overlapping text, so the first match of each group
+# is the same as searching for it separately.
+_FACTS_RE = re.compile(r'\b(?P<years>\d+)\s*years?|\b(?P<mult>\d+\.?\d*)\s*(?:x|times)\b')
+
+# Keyword bits for the section-text checks in run_check. A section is
+# scanned once and the checks test bits instead of re-searching the text.
+KW_CONFIDENTI = 1 << 0
+KW_1_5 = 1 << 1
+KW_TOTAL_FEES = 1 << 2
+KW_SELL = 1 << 3
+KW_COMMERCIAL = 1 << 4
+KW_30_DAYS = 1 << 5
+KW_30_DAY = 1 << 6
+KW_PAYMENT_IN_LIEU = 1 << 7
+KW_NEGLIG = 1 << 8
+KW_CLIENT = 1 << 9
+KW_INDEMN = 1 << 10
+KW_PROVIDER = 1 << 11
+KW_COMPANY = 1 << 12
+KW_SUSPEND = 1 << 13
+KW_99_5 = 1 << 14
+KW_UPTIME = 1 << 15
+KW_GUARANTEE = 1 << 16
+KW_COMPENS = 1 << 17
+KW_SECURITY = 1 << 18
+KW_ENCRYPTION = 1 << 19
+KW_ACCESS_CONTROL = 1 << 20
+KW_SAFEGUARD = 1 << 21
+KW_IMPLEMENT = 1 << 22
+KW_REFUND = 1 << 23
+KW_REMEDY = 1 << 24
+KW_LAW = 1 << 25
+KW_NEW_YORK = 1 << 26
+KW_GOVERNED_BY_LAWS_OF = 1 << 27
+KW_STATE_OF = 1 << 28
+KW_PANEL = 1 << 29
+KW_ARBITRATION = 1 << 30
+KW_BINDING = 1 << 31
+KW_INDEPENDENT = 1 << 32
+KW_JUDICIAL = 1 << 33
+
+_KEYWORD_BITS = {
+    'confidenti': KW_CONFIDENTI,
+    '1.5': KW_1_5,
+    'total fees': KW_TOTAL_FEES,
+    'sell': KW_SELL,
+    'commercial': KW_COMMERCIAL,
+    '30 days': KW_30_DAYS,
+    '30-day': KW_30_DAY,
+    'payment in lieu': KW_PAYMENT_IN_LIEU,
+    'neglig': KW_NEGLIG,
+    'client': KW_CLIENT,
+    'indemn': KW_INDEMN,
+    'provider': KW_PROVIDER,
+    'company': KW_COMPANY,
+    'suspend': KW_SUSPEND,
+    '99.5': KW_99_5,
+    'uptime': KW_UPTIME,
+    'guarantee': KW_GUARANTEE,
+    'compens': KW_COMPENS,
+    'security': KW_SECURITY,
+    'encryption': KW_ENCRYPTION,
+    'access control': KW_ACCESS_CONTROL,
+    'safeguard': KW_SAFEGUARD,
+    'implement': KW_IMPLEMENT,
+    'refund': KW_REFUND,
+    'remedy': KW_REMEDY,
+    'law': KW_LAW,
+    'new york': KW_NEW_YORK,
+    'governed by the laws of': KW_GOVERNED_BY_LAWS_OF,
+    'state of': KW_STATE_OF,
+    'panel': KW_PANEL,
+    'arbitration': KW_ARBITRATION,
+    'binding': KW_BINDING,
+    'independent': KW_INDEPENDENT,
+    'judicial': KW_JUDICIAL,
+}
+
+# Measured on the sample contracts, one C-level substring search per keyword
+# is ~5x faster than a single regex alternation pass (which needs a lookahead
+# at every position to see overlapping keywords), and it is exact.
+_KEYWORD_ITEMS = tuple(_KEYWORD_BITS.items())
+
+def keyword_flags(text_lower: str) -> int:
+    """Return the bitmask of KW_* keywords present in already-lowered text."""
+    flags = 0
+    for keyword, bit in _KEYWORD_ITEMS:
+        if keyword in text_lower:
+            flags |= bit
+    return flags
+
+# Check kinds, in the order the original clause cascade tried them
+(CHECK_CONFIDENTIALITY, CHECK_LIABILITY, CHECK_DATA_SALE, CHECK_TERMINATION, CHECK_INDEMNITY,
+ CHECK_AVAILABILITY, CHECK_SECURITY, CHECK_REFUND, CHECK_GOVERNING_LAW, CHECK_DISPUTE,
+ CHECK_UNMATCHED) = range(11)
+
+# Section keywords that select a check even when the policy itself does not
+_KIND_TRIGGERS = (
+    (CHECK_CONFIDENTIALITY, KW_CONFIDENTI),
+    (CHECK_AVAILABILITY, KW_SUSPEND),
+    (CHECK_SECURITY, KW_SECURITY),
+    (CHECK_GOVERNING_LAW, KW_LAW),
+    (CHECK_DISPUTE, KW_PANEL),
+)
+_KIND_TRIGGER_MASK = KW_CONFIDENTI | KW_SUSPEND | KW_SECURITY | KW_LAW | KW_PANEL
+
+def policy_kind(clause_lower: str, rule_lower: str) -> int:
+    """Pick the check for a policy from its lowered clause name and rule text."""
+    if 'confidential' in clause_lower:
+        return CHECK_CONFIDENTIALITY
+    if 'liability' in clause_lower or 'liability' in rule_lower:
+        return CHECK_LIABILITY
+    if 'data' in clause_lower or 'sell' in rule_lower or 'commercialize' in rule_lower:
+        return CHECK_DATA_SALE
+    if 'terminat' in clause_lower or 'termination' in rule_lower:
+        return CHECK_TERMINATION
+    if 'indemn' in clause_lower or 'indemn' in rule_lower:
+        return CHECK_INDEMNITY
+    if 'availability' in clause_lower or 'uptime' in rule_lower:
+        return CHECK_AVAILABILITY
+    if 'security' in clause_lower or 'protect' in rule_lower:
+        return CHECK_SECURITY
+    if 'refund' in clause_lower or 'refund' in rule_lower:
+        return CHECK_REFUND
+    if 'govern' in clause_lower or 'governing' in rule_lower:
+        return CHECK_GOVERNING_LAW
+    if 'dispute' in clause_lower or 'arbitration' in rule_lower:
+        return CHECK_DISPUTE
+    return CHECK_UNMATCHED
+
+class PreparedPolicy(dict):
+    """A policy entry as returned by prepare_policy.
+
+    The type, not the presence of a 'check_kind' key, marks an entry as
+    prepared: raw entries loaded from JSON are always plain dicts.
+    """
+
+def prepare_policy(p: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of a policy entry with its lowered text and check kind precomputed."""
+    clause_name_lower = p.get('clause_name').lower()
+    policy_rule_lower = p.get('policy_rule').lower()
+    prepared = PreparedPolicy(p)
+    prepared['importance'] = float(p.get('importance', 1.0))
+    prepared['clause_name_lower'] = clause_name_lower
+    prepared['policy_rule_lower'] = policy_rule_lower
+    prepared['check_kind'] = policy_kind(clause_name_lower, policy_rule_lower)
+    return prepared
+
+def prepare_policies(policy: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Prepare every policy once at load time (see prepare_policy)."""
+    return [prepare_policy(p) for p in policy]
+
+def resolve_kind(kind: int, flags: int) -> int:
+    """Return the check to run for a policy of the given kind on a section with these keyword flags."""
+    if not flags & _KIND_TRIGGER_MASK:
+        return kind
+    for trigger_kind, bit in _KIND_TRIGGERS:
+        if trigger_kind >= kind:
+            break
+        if flags & bit:
+            return trigger_kind
+    return kind
+
+def section_facts(text_lower: str) -> Tuple[Optional[int], Optional[float]]:
+    """Return the first (years, multiplier) found in lowered section text; None where absent."""
+    years = None
+    multiplier = None
+    for m in _FACTS_RE.finditer(text_lower):
+        if m.lastgroup == 'years':
+            if years is None:
+                years = int(m.group('years'))
+        elif multiplier is None:
+            multiplier = float(m.group('mult'))
+        if years is not None and multiplier is not None:
+            break
+    return years, multiplier
+
+@functools.lru_cache(maxsize=4096)
+def section_profile(section_text: str) -> Tuple[int, Optional[int], Optional[float]]:
+    """Return (keyword flags, years, multiplier) for a section's raw text.
+
+    Cached by text: boilerplate sections repeat across contracts in a batch run.
+    """
+    text_lower = section_text.lower()
+    years, multiplier = section_facts(text_lower)
+    return keyword_flags(text_lower), years, multiplier
+
+@functools.lru_cache(maxsize=16384)
+def run_check(kind: int, flags: int, years: Optional[int], multiplier: Optional[float]) -> Tuple[bool, int, str]:
+    """Run a resolved check kind on a section's keyword flags and facts.
+
+    Returns (is_violation, risk_level, reasoning) with risk_level one of
+    RISK_LOW/RISK_MEDIUM/RISK_HIGH. The verdict does not depend on
+    the policy text, so it is cached and shared between policies of the same kind.
+    """
     is_violation = False
-    risk_level = 'LOW'
+    risk_level = RISK_LOW
     reasoning = ''
-    citation = 'SECTION (in-file)'
 
     # Confidentiality rule check
-    if 'confidential' in clause.lower() or 'confidenti' in txt:
+    if kind == CHECK_CONFIDENTIALITY:
         # expect at least 3 years
-        m = re.search(r'(\b(\d+)\s*years?)', txt)
-        if m:
-            years = int(m.group(2))
+        if years is not None:
             if years < 3:
                 is_violation = True
-                risk_level = 'MEDIUM'
+                risk_level = RISK_MEDIUM
                 reasoning = f'Found confidentiality duration {years} year(s) but policy requires >= 3 years.'
             else:
                 is_violation = False
-                risk_level = 'LOW'
+                risk_level = RISK_LOW
                 reasoning = f'Confidentiality duration {years} year(s) meets policy.'
         else:
             is_violation = True
-            risk_level = 'MEDIUM'
+            risk_level = RISK_MEDIUM
             reasoning = 'No explicit confidentiality duration found.'
 
     # Liability rule check
-    elif 'liability' in clause.lower() or 'liability' in policy_rule.lower():
-        if re.search(r'(\b(\d+\.?\d*)\s*(x|times)\b)', txt) or ('1.5' in txt) or ('total fees' in txt):
-            m = re.search(r'(\b(\d+\.?\d*)\s*(x|times)\b)', txt)
-            if m:
-                val = float(m.group(2))
+    elif kind == CHECK_LIABILITY:
+        if multiplier is not None or (flags & KW_1_5) or (flags & KW_TOTAL_FEES):
+            if multiplier is not None:
+                val = multiplier
                 if val <= 1.5:
                     is_violation = False
-                    risk_level = 'LOW'
+                    risk_level = RISK_LOW
                     reasoning = f'Liability capped at {val}x which meets policy.'
                 else:
                     is_violation = True
-                    risk_level = 'HIGH'
+                    risk_level = RISK_HIGH
                     reasoning = f'Liability capped at {val}x which exceeds policy 1.5x.'
             else:
-                if '1.5' in txt:
+                if flags & KW_1_5:
                     is_violation = False
-                    risk_level = 'LOW'
+                    risk_level = RISK_LOW
                     reasoning = 'Liability text contains 1.5 token; treated as compliant (heuristic).'
                 else:
                     # ambiguous 'total fees paid' -> treat as violation (no multiplier)
-                    if 'total fees' in txt:
+                    if flags & KW_TOTAL_FEES:
                         is_violation = True
-                        risk_level = 'HIGH'
+                        risk_level = RISK_HIGH
                         reasoning = 'Liability limited to total fees paid (no multiplier) -> treated as violation per policy.'
                     else:
                         is_violation = True
-                        risk_level = 'HIGH'
+                        risk_level = RISK_HIGH
                         reasoning = 'Liability cap not numeric or absent; treated as violation.'
         else:
             is_violation = True
-            risk_level = 'HIGH'
+            risk_level = RISK_HIGH
             reasoning = 'No explicit safe liability cap found.'
 
     # Data sale prohibition
-    elif 'data' in clause.lower() or 'sell' in policy_rule.lower() or 'commercialize' in policy_rule.lower():
-        if 'sell' in txt or 'commercial' in txt:
+    elif kind == CHECK_DATA_SALE:
+        if flags & KW_SELL or flags & KW_COMMERCIAL:
             is_violation = True
-            risk_level = 'HIGH'
+            risk_level = RISK_HIGH
             reasoning = 'Clause allows selling or commercializing client data without consent.'
         else:
             is_violation = False
-            risk_level = 'LOW'
+            risk_level = RISK_LOW
             reasoning = 'No data sale detected.'
 
     # Termination notice
-    elif 'terminat' in clause.lower() or 'termination' in policy_rule.lower():
-        if '30 days' in txt or '30-day' in txt or 'payment in lieu' in txt:
+    elif kind == CHECK_TERMINATION:
+        if flags & KW_30_DAYS or flags & KW_30_DAY or flags & KW_PAYMENT_IN_LIEU:
             is_violation = False
-            risk_level = 'LOW'
+            risk_level = RISK_LOW
             reasoning = 'Adequate termination notice found.'
         else:
             is_violation = True
-            risk_level = 'MEDIUM'
+            risk_level = RISK_MEDIUM
             reasoning = 'No adequate termination notice found.'
 
     # Indemnity scope
-    elif 'indemn' in clause.lower() or 'indemn' in policy_rule.lower():
-        if 'neglig' in txt and ('client' in txt and 'indemn' in txt):
+    elif kind == CHECK_INDEMNITY:
+        if flags & KW_NEGLIG and (flags & KW_CLIENT and flags & KW_INDEMN):
             # if client indemnifies including provider negligence -> violation
-            if 'provider' in txt or 'company' in txt:
+            if flags & KW_PROVIDER or flags & KW_COMPANY:
                 is_violation = True
-                risk_level = 'HIGH'
+                risk_level = RISK_HIGH
                 reasoning = 'Client indemnifies provider even for provider negligence -> violation.'
             else:
                 is_violation = True
-                risk_level = 'MEDIUM'
+                risk_level = RISK_MEDIUM
                 reasoning = 'Broad indemnity language present; needs narrowing.'
         else:
             is_violation = False
-            risk_level = 'LOW'
+            risk_level = RISK_LOW
             reasoning = 'Indemnity language not overly broad.'
 
     # Service availability
-    elif 'availability' in clause.lower() or 'uptime' in policy_rule.lower() or 'suspend' in txt:
-        if '99.5' in txt or 'uptime' in txt or 'guarantee' in txt or 'compens' in txt:
+    elif kind == CHECK_AVAILABILITY:
+        if flags & KW_99_5 or flags & KW_UPTIME or flags & KW_GUARANTEE or flags & KW_COMPENS:
             is_violation = False
-            risk_level = 'LOW'
+            risk_level = RISK_LOW
             reasoning = 'Service availability / uptime commitment present.'
         else:
             is_violation = True
-            risk_level = 'MEDIUM'
+            risk_level = RISK_MEDIUM
             reasoning = 'No uptime guarantee; provider may suspend arbitrarily.'
 
     # Security responsibility
-    elif 'security' in clause.lower() or 'protect' in policy_rule.lower() or 'security' in txt:
-        if 'encryption' in txt or 'access control' in txt or 'safeguard' in txt or 'implement' in txt:
+    elif kind == CHECK_SECURITY:
+        if flags & KW_ENCRYPTION or flags & KW_ACCESS_CONTROL or flags & KW_SAFEGUARD or flags & KW_IMPLEMENT:
             is_violation = False
-            risk_level = 'LOW'
+            risk_level = RISK_LOW
             reasoning = 'Security obligations present.'
         else:
             is_violation = True
-            risk_level = 'HIGH'
+            risk_level = RISK_HIGH
             reasoning = 'Provider disclaims security responsibilities.'
 
     # Refund policy
-    elif 'refund' in clause.lower() or 'refund' in policy_rule.lower():
-        if 'refund' in txt or 'compens' in txt or 'remedy' in txt:
+    elif kind == CHECK_REFUND:
+        if flags & KW_REFUND or flags & KW_COMPENS or flags & KW_REMEDY:
             is_violation = False
-            risk_level = 'LOW'
+            risk_level = RISK_LOW
             reasoning = 'Refund or remedy terms present.'
         else:
             is_violation = True
-            risk_level = 'MEDIUM'
+            risk_level = RISK_MEDIUM
             reasoning = 'No refund/remedy for outages or breaches.'
 
     # Governing law validity
-    elif 'govern' in clause.lower() or 'governing' in policy_rule.lower() or 'law' in txt:
-        if 'new york' in txt or 'governed by the laws of' in txt or 'state of' in txt:
+    elif kind == CHECK_GOVERNING_LAW:
+        if flags & KW_NEW_YORK or flags & KW_GOVERNED_BY_LAWS_OF or flags & KW_STATE_OF:
             is_violation = False
-            risk_level = 'LOW'
+            risk_level = RISK_LOW
             reasoning = 'Recognized legal jurisdiction present.'
         else:
             is_violation = True
-            risk_level = 'HIGH'
+            risk_level = RISK_HIGH
             reasoning = 'Governing law not a recognized jurisdiction or only internal policies.'
 
     # Dispute resolution fairness
-    elif 'dispute' in clause.lower() or 'arbitration' in policy_rule.lower() or 'panel' in txt:
-        if 'arbitration' in txt and ('binding' in txt or 'independent' in txt or 'judicial' in txt):
+    elif kind == CHECK_DISPUTE:
+        if flags & KW_ARBITRATION and (flags & KW_BINDING or flags & KW_INDEPENDENT or flags & KW_JUDICIAL):
             is_violation = False
-            risk_level = 'LOW'
+            risk_level = RISK_LOW
             reasoning = 'Independent arbitration or judicial review allowed.'
         else:
             is_violation = True
-            risk_level = 'HIGH'
+            risk_level = RISK_HIGH
             reasoning = 'Dispute resolution is unilateral or internal-only.'
 
     else:
         # Default: not matched - treat as low risk
         is_violation = False
-        risk_level = 'LOW'
+        risk_level = RISK_LOW
         reasoning = 'Clause not directly matched by deterministic checks (treated as low risk).'
 
+    return is_violation, risk_level, reasoning
+
+def _risk_check(clause_name: str, policy_rule: str, extracted_text: str,
+                verdict: Tuple[bool, int, str]) -> Dict[str, Any]:
+    # Plain dict with the fields of src.models.RiskCheck (built per section x policy,
+    # so skip model construction/validation on this path)
+    is_violation, risk_level, reasoning = verdict
+    return {
+        'clause_name': clause_name,
+        'policy_rule': policy_rule,
+        'extracted_text': extracted_text,
+        'is_violation': is_violation,
+        'risk_level': _RISK_LABELS[risk_level],
+        'citation': 'SECTION (in-file)',
+        'reasoning': reasoning
+    }
+
+def local_rule_check(clause_name: str, policy_rule: str, relevant_text: str, flags: Optional[int] = None,
+                     facts: Optional[Tuple[Optional[int], Optional[float]]] = None,
+                     kind: Optional[int] = None) -> Dict[str, Any]:
+    # Basic deterministic checks for demo purposes
+    # Callers looping over many sections/policies can pass the keyword flags,
+    # section_facts() and policy_kind() they already computed.
+    if flags is None or facts is None:
+        profile = section_profile(relevant_text or '')
+        if flags is None:
+            flags = profile[0]
+        if facts is None:
+            facts = profile[1:]
+    years, multiplier = facts
+    if kind is None:
+        kind = policy_kind(clause_name.lower(), policy_rule.lower())
+    verdict = run_check(resolve_kind(kind, flags), flags, years, multiplier)
+    return _risk_check(clause_name, policy_rule, (relevant_text or '')[:1000], verdict)
+
+Verdict = Tuple[bool, int, str]
+PolicySetFn = Callable[[int, Optional[int], Optional[float]], Tuple[Verdict, ...]]
+
+def _check_kind(p: Dict[str, Any]) -> int:
+    """Validated CHECK_* kind of a policy entry (prepared or raw)."""
+    kind = (p if isinstance(p, PreparedPolicy) else prepare_policy(p))["check_kind"]
+    try:
+        kind = int(kind)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid check_kind {kind!r} for policy {p.get('clause_name')!r}") from None
+    if kind not in range(CHECK_UNMATCHED + 1):
+        raise ValueError(f"Invalid check_kind {kind!r} for policy {p.get('clause_name')!r}")
+    return kind
+
+def compile_policies(policy: List[Dict[str, Any]]) -> PolicySetFn:
+    """Return a function mapping a section's (flags, years, multiplier) to one verdict per policy.
+
+    Each distinct check kind in the set is run once per section and its
+    verdict shared by every policy of that kind, in policy order.
+    """
+    kinds = [_check_kind(p) for p in policy]
+    distinct = sorted(set(kinds))
+    slot = {kind: i for i, kind in enumerate(distinct)}
+    order = [slot[kind] for kind in kinds]
 
-    return RiskCheck(
-        clause_name=clause_name,
-        policy_rule=policy_rule,
-        extracted_text=(relevant_text or '')[:1000],
-        is_violation=is_violation,
-        risk_level=risk_level,
-        citation=citation,
-        reasoning=reasoning
-    )
+    def run(flags, years, multiplier):
+        verdicts = [run_check(resolve_kind(kind, flags), flags, years, multiplier) for kind in distinct]
+        return tuple([verdicts[i] for i in order])
 
-def analyze_chunks_against_policy_all_sections(chunks: List[Dict[str, Any]], policy: List[Dict[str,Any]]) -> Dict[str,Any]:
+    return run
+
+def _ordered_sum(a: np.ndarray) -> float:
+    """Sum of a's elements added one by one in row-major order (np.sum adds pairwise)."""
+    return float(np.cumsum(a, axis=None)[-1]) if a.size else 0.0
+
+def _top_indices(scores: np.ndarray, n: int) -> List[int]:
+    """Indices of the n largest scores, highest first; ties keep their original order."""
+    if n <= 0:
+        return []
+    if n < len(scores):
+        kth = np.partition(scores, len(scores) - n)[len(scores) - n]
+        candidates = np.flatnonzero(scores >= kth)
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind='stable')][:n].tolist()
+
+def _analyze_one_chunk(c: Dict[str, Any], policy: List[Dict[str, Any]], run_policies) -> Tuple[Dict[str, Any], List[Dict[str, Any]], List[bool], List[int]]:
+    # Evaluate every policy rule against one chunk (section); returns the section
+    # summary, its RiskCheck dicts, and per-policy violation flags / risk levels
+    section_text = c.get('text','')
+    section_id = c.get('id', None)
+    flags, years, multiplier = section_profile(section_text)
+    extracted_text = section_text[:1000]
+    section_result = {
+        'id': section_id,
+        'text': section_text[:300],
+        'violations': [],
+        'section_violation_weight': 0.0,
+        'section_importance_total': 0.0
+    }
+    results = []
+    violation_flags = []
+    risk_indices = []
+    for p, verdict in zip(policy, run_policies(flags, years, multiplier)):
+        rcd = _risk_check(p['clause_name'], p['policy_rule'], extracted_text, verdict)
+        # attach metadata
+        rcd['section_id'] = section_id
+        rcd['importance'] = p['importance']
+        results.append(rcd)
+        violation_flags.append(verdict[0])
+        risk_indices.append(verdict[1])
+    return section_result, results, violation_flags, risk_indices
+
+# Per-process state for ProcessPoolExecutor workers (the policy-set closure
+# cannot be pickled, so each worker builds its own)
+_worker_policy = None
+_worker_run_policies = None
+
+def _init_worker(policy: List[Dict[str, Any]]) -> None:
+    global _worker_policy, _worker_run_policies
+    _worker_policy = policy
+    _worker_run_policies = compile_policies(policy)
+
+def _analyze_chunk_in_worker(c: Dict[str, Any]):
+    return _analyze_one_chunk(c, _worker_policy, _worker_run_policies)
+
+def analyze_chunks_against_policy_all_sections(chunks: List[Dict[str, Any]], policy: List[Dict[str,Any]],
+                                               top_n: int = 10, workers: Optional[int] = None) -> Dict[str,Any]:
     results = []  # list of RiskCheck dicts
     section_scores = []  # per-section aggregated info
-    total_violation_weight = 0.0
-    total_importance = 0.0
+    violation_flags = []  # is_violation per (section, policy), row-major
+    risk_indices = []  # RISK_* level per (section, policy), row-major
+
+    # Classify each policy once instead of once per section (callers may pass
+    # policies already run through prepare_policies), then build one function
+    # returning every policy's verdict for a section
+    policy = [p if isinstance(p, PreparedPolicy) else prepare_policy(p) for p in policy]
+    importance = np.array([p['importance'] for p in policy], dtype=np.float64)
 
     # Compute total importance (denominator) as sum of importance of each policy
-    for p in policy:
-        total_importance += p.get('importance', 1.0) * 1.0  # base multiplier
-
-    # For each chunk (section), evaluate every policy rule against that chunk
-    for c in chunks:
-        section_text = c.get('text','')
-        section_id = c.get('id', None)
-        section_result = {
-            'id': section_id,
-            'text': section_text[:300],
-            'violations': [],
-            'section_violation_weight': 0.0,
-            'section_importance_total': 0.0
-        }
-        for p in policy:
-            clause_name = p.get('clause_name')
-            policy_rule = p.get('policy_rule')
-            importance = p.get('importance',1.0)
-            rc = local_rule_check(clause_name, policy_rule, section_text)
-            # attach metadata
-            rcd = rc.dict()
-            rcd['section_id'] = section_id
-            rcd['importance'] = importance
-            results.append(rcd)
-            section_result['section_importance_total'] += importance
-            if rc.is_violation:
-                w = RISK_WEIGHTS.get(rc.risk_level, 0.2) * importance
-                section_result['section_violation_weight'] += w
-                total_violation_weight += w
+    total_importance = _ordered_sum(importance)
+
+    # Sections are independent; with workers > 1 they are analyzed in a process
+    # pool (the checks are pure Python, so threads would serialize on the GIL)
+    if workers and workers > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(policy,)) as executor:
+            chunk_results = list(executor.map(_analyze_chunk_in_worker, chunks,
+                                              chunksize=max(1, len(chunks) // (workers * 4))))
+    else:
+        run_policies = compile_policies(policy)
+        chunk_results = [_analyze_one_chunk(c, policy, run_policies) for c in chunks]
+
+    for section_result, section_results, section_flags, section_risks in chunk_results:
+        section_result['section_importance_total'] = total_importance
         section_scores.append(section_result)
+        results.extend(section_results)
+        violation_flags.extend(section_flags)
+        risk_indices.extend(section_risks)
+
+    # Weighted violations as a (sections x policies) matrix
+    shape = (len(section_scores), len(policy))
+    is_violation = np.array(violation_flags, dtype=bool).reshape(shape)
+    risk_level_idx = np.array(risk_indices, dtype=np.int8).reshape(shape)
+    weights_mat = _RISK_WEIGHT_ARRAY[risk_level_idx] * is_violation * importance[None, :]
+
+    # Running sums in the order the per-section loop used to add them, so the
+    # reported floats (and ties between them) are the same as summing one by one
+    section_weights = np.cumsum(weights_mat, axis=1)[:, -1] if shape[1] else np.zeros(shape[0])
+    for s, w in zip(section_scores, section_weights.tolist()):
+        s['section_violation_weight'] = w
+    total_violation_weight = _ordered_sum(weights_mat)
 
     # document-level risk percentage
-    max_possible = total_importance * max(RISK_WEIGHTS.values())
+    max_possible = total_importance * max(_RISK_WEIGHTS_T)
     risk_percentage = min(100.0, (total_violation_weight / max_possible) * 100.0 if max_possible > 0 else 0.0)
 
-    # derive top risky sections and top risky rules
-    sorted_sections = sorted(section_scores, key=lambda x: x['section_violation_weight'], reverse=True)
-    top_sections = [{'id': s['id'], 'snippet': s['text'], 'score': round(s['section_violation_weight'],3)} for s in sorted_sections if s['section_violation_weight']>0]
-    # aggregate by clause name
-    clause_agg = {}
-    for r in results:
-        if r['is_violation']:
-            clause_agg[r['clause_name']] = clause_agg.get(r['clause_name'], 0.0) + (RISK_WEIGHTS.get(r['risk_level'],0.2) * r.get('importance',1.0))
+    # derive the top_n risky sections and rules (ties keep document order)
+    top_sections = [{'id': section_scores[i]['id'], 'snippet': section_scores[i]['text'], 'score': round(section_weights[i].item(),3)}
+                    for i in _top_indices(section_weights, top_n) if section_weights[i] > 0]
+    # aggregate by clause name, in order of each clause's first violation; each
+    # clause's weights are summed section by section (row-major), as results are
+    violated = np.flatnonzero(is_violation.any(axis=0))
+    clause_cols = {}
+    if violated.size:
+        first_violation = is_violation[:, violated].argmax(axis=0) * shape[1] + violated
+        for i in violated[np.argsort(first_violation, kind='stable')].tolist():
+            clause_cols.setdefault(policy[i]['clause_name'], []).append(i)
+    clause_agg = {name: _ordered_sum(weights_mat[:, sorted(cols)]) for name, cols in clause_cols.items()}
 
-    top_clauses = sorted([{'clause_name': k, 'score': v} for k,v in clause_agg.items()], key=lambda x: x['score'], reverse=True)
+    clause_names = list(clause_agg)
+    clause_scores = np.array(list(clause_agg.values()), dtype=np.float64)
+    top_clauses = [{'clause_name': clause_names[i], 'score': clause_scores[i].item()}
+                   for i in _top_indices(clause_scores, top_n)]
 
     return {
         'results': results,
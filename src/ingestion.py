@@ -1,20 +1,65 @@
-from typing import List, Dict, Any
+import mmap
+import os
+import stat
+from typing import List, Dict, Any, Iterator
+
+def _iter_text_chunks(file_path: str) -> Iterator[Dict[str, Any]]:
+    # Streams the file line by line (text mode, so '\r\n' / '\r' become '\n')
+    # and splits sections on blank lines, like content.split('\n\n').
+    idx = 0
+    buf = []
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line == '\n' and buf and buf[-1].endswith('\n'):
+                # '\n\n' separator: the first newline ends the buffered section
+                clean_text = ''.join(buf).strip()
+                if clean_text:
+                    yield {'id': idx, 'text': clean_text, 'type': 'NarrativeText'}
+                idx += 1
+                buf = []
+            else:
+                buf.append(line)
+    clean_text = ''.join(buf).strip()
+    if clean_text:
+        yield {'id': idx, 'text': clean_text, 'type': 'NarrativeText'}
+
+def iter_file_chunks(file_path: str) -> Iterator[Dict[str, Any]]:
+    # Memory-maps the file and finds b'\n\n' boundaries on the raw bytes,
+    # decoding one section at a time, so the whole file is never held as a
+    # str. Ids/texts match content.split('\n\n') on the decoded file.
+    if not stat.S_ISREG(os.stat(file_path).st_mode):
+        # pipes, FIFOs, /dev/stdin: no usable size and cannot be mapped
+        yield from _iter_text_chunks(file_path)
+        return
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm.find(b'\r') != -1:
+                # needs newline translation; fall back to the text-mode scanner
+                yield from _iter_text_chunks(file_path)
+                return
+            idx = 0
+            start = 0
+            while start <= size:
+                end = mm.find(b'\n\n', start)
+                if end == -1:
+                    end = size
+                # b'\n' never occurs inside a multi-byte UTF-8 sequence
+                clean_text = mm[start:end].decode('utf-8').strip()
+                if clean_text:
+                    yield {'id': idx, 'text': clean_text, 'type': 'NarrativeText'}
+                idx += 1
+                start = end + 2
 
 def chunk_file_with_unstructured(file_path: str) -> List[Dict[str, Any]]:
     print('➡ Step 1: Chunking file (Offline Mode)...')
-    chunks = []
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        chunks = list(iter_file_chunks(file_path))
     except Exception as e:
         print('Local processing error:', e)
         return []
 
-    raw_sections = content.split('\n\n')
-    for idx, section in enumerate(raw_sections):
-        clean_text = section.strip()
-        if clean_text:
-            chunks.append({'id': idx, 'text': clean_text, 'type': 'NarrativeText'})
-
     print(f'   ✅ Offline Success: Created {len(chunks)} chunks from file.')
     return chunks
@@ -0,0 +1,17 @@
+"""
+src/policy_compile.py
+
+Policy-set verdict function, kept importable from its original location.
+
+compile_policies lives in src.analysis next to run_check and is re-exported
+here. It returns a plain closure that runs each distinct check kind in the
+set once per section and hands back one verdict per policy, in policy order.
+
+Usage:
+- run = compile_policies(prepare_policies(policies))
+- verdicts = run(flags, years, multiplier)
+"""
+
+from src.analysis import PolicySetFn, Verdict, compile_policies
+
+__all__ = ['PolicySetFn', 'Verdict', 'compile_policies']
@@ -11,16 +11,26 @@ This version FIXES the '404 model not found' issues by using correct model names
 
 Usage:
 - generate_policy_from_chunks(chunks, source_doc, use_model=False)
+- generate_policies_batch([(chunks, source_doc), ...], use_model=False)
+- generate_policies([(chunks, source_doc), ...], use_model=False)  (concurrent; async: generate_policies_async)
 - save_policy_json(policy_obj, path)
 """
 
 import os
 import json
+import asyncio
 import uuid
 import datetime
 import re
 import time
-from typing import List, Dict, Any, Optional
+import random
+import hashlib
+import functools
+from typing import List, Dict, Any, Optional, Tuple
+try:
+    import orjson
+except ImportError:  # optional: faster JSON parsing / output
+    orjson = None
 
 DEFAULT_CONFIDENCE = 0.8
 
@@ -29,11 +39,35 @@ DEFAULT_CONFIDENCE = 0.8
 # -------------------------------------------------------
 GEMINI_MODEL = os.environ.get("GEMINI_MODEL", "gemini-1.5-flash")
 
+# Patterns used per document / per model response (compiled once at import)
+# the duration must follow "confidenti" within the same sentence (no '.' or
+# newline in between) and within 200 characters, which also bounds the lazy scan
+_CONF_RE = re.compile(r'confidenti[^.\n]{0,200}?(\d+)\s*years?', re.IGNORECASE)
+# fallback keyword tests, case-insensitive so the contract text is never lowercased
+_LIABILITY_RE = re.compile(r'liability', re.IGNORECASE)
+_DATA_SALE_RE = re.compile(r'sell|commercial', re.IGNORECASE)
+_SECURITY_RE = re.compile(r'encrypt|security', re.IGNORECASE)
+_GOVERNING_LAW_RE = re.compile(r'governed by', re.IGNORECASE)
+_NUM_RE = re.compile(r'(\d+(?:\.\d+)?)')  # integers and decimals, e.g. the 1.5 in "1.5x"
+_JSON_SCAN_RE = re.compile(r'[{}"\\]')  # characters that matter for brace matching
+
 # -------------------------------------------------------
 # Utility helpers
 # -------------------------------------------------------
+# (unix second, ISO-8601 string, compact policy-id stamp) for the last second formatted
+_LAST_NOW = (None, "", "")
+
+def _now_strings() -> Tuple[str, str]:
+    """UTC now as (ISO-8601 'Z' string, YYYYmmddHHMMSS), re-formatted only when the second changes."""
+    global _LAST_NOW
+    t = int(time.time())
+    if t != _LAST_NOW[0]:
+        dt = datetime.datetime.fromtimestamp(t, datetime.timezone.utc)
+        _LAST_NOW = (t, dt.strftime("%Y-%m-%dT%H:%M:%SZ"), dt.strftime("%Y%m%d%H%M%S"))
+    return _LAST_NOW[1], _LAST_NOW[2]
+
 def _now_iso():
-    return datetime.datetime.utcnow().isoformat() + "Z"
+    return _now_strings()[0]
 
 def _safe_float(x, default=1.0):
     try:
@@ -44,116 +78,197 @@ def _safe_float(x, default=1.0):
 # -------------------------------------------------------
 # JSON extraction helper
 # -------------------------------------------------------
+def _json_loads(text: str):
+    # orjson is stricter (no NaN/Infinity, no lone surrogates); anything it
+    # rejects gets a second chance with the stdlib parser
+    if orjson is not None:
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(text)
+
 def _extract_json_from_text(text: str) -> Optional[dict]:
     """Extract the first JSON object from text."""
     if not text:
         return None
 
     try:
-        parsed = json.loads(text)
+        parsed = _json_loads(text)
         if isinstance(parsed, dict):
             return parsed
     except:
         pass
 
-    m = re.search(r"(\{[\s\S]*\})", text)
-    if not m:
-        return None
-
-    candidate = m.group(1)
-
-    for end in range(len(candidate), 0, -1):
+    for start, end in _find_json_spans(text):
         try:
-            parsed = json.loads(candidate[:end])
+            parsed = _json_loads(text[start:end + 1])
             if isinstance(parsed, dict):
                 return parsed
-        except:
+        except Exception:
             continue
 
     return None
 
+def _find_json_spans(text: str):
+    """Yield (start, end) of each top-level {...} span in text, end inclusive.
+
+    Single left-to-right pass tracking brace depth; braces inside JSON strings
+    (including escaped quotes) are ignored.
+    """
+    depth = 0
+    start = 0
+    in_string = False
+    skip = -1  # index of a character escaped by a backslash
+    for m in _JSON_SCAN_RE.finditer(text):
+        i = m.start()
+        ch = m.group()
+        if in_string:
+            if i == skip:
+                continue
+            if ch == "\\":
+                skip = i + 1
+            elif ch == '"':
+                in_string = False
+        elif ch == "{":
+            if depth == 0:
+                start = i
+            depth += 1
+        elif ch == "}":
+            if depth:
+                depth -= 1
+                if depth == 0:
+                    yield start, i
+        elif ch == '"' and depth:
+            in_string = True
+
 # -------------------------------------------------------
 # Deterministic offline fallback (no model)
 # -------------------------------------------------------
-def _deterministic_policy_from_chunks(chunks: List[Dict[str, Any]], source_doc: str) -> Dict[str, Any]:
-    """Heuristic risk-policy generator used when Gemini fails."""
-    rules = []
+class _TextDigest:
+    """Cache key for a contract's joined text, hashed and compared by BLAKE2b digest."""
+    __slots__ = ("digest", "data")
+
+    def __init__(self, data: str):
+        self.data = data
+        self.digest = hashlib.blake2b(data.encode("utf-8", "surrogatepass"), digest_size=16).digest()
 
-    def add_rule(clause_name, policy_rule, explanation, severity, importance, recommended_fix, citation, confidence=DEFAULT_CONFIDENCE):
-        rules.append({
-            "rule_id": uuid.uuid4().hex[:8],
-            "clause_name": clause_name,
-            "policy_rule": policy_rule,
-            "explanation": explanation,
-            "severity": severity,
-            "importance": importance,
-            "examples": [],
-            "recommended_fix": recommended_fix,
-            "citation": citation,
-            "confidence": confidence
-        })
-
-    full_text = "\n\n".join(c.get("text", "") for c in chunks).lower()
+    def __hash__(self):
+        return hash(self.digest)
+
+    def __eq__(self, other):
+        return isinstance(other, _TextDigest) and self.digest == other.digest
+
+def _template(clause_name, policy_rule, explanation, severity, importance, recommended_fix, citation, confidence=DEFAULT_CONFIDENCE):
+    # rule_id is stamped per policy; key order matches the emitted rule dicts
+    return {
+        "rule_id": None,
+        "clause_name": clause_name,
+        "policy_rule": policy_rule,
+        "explanation": explanation,
+        "severity": severity,
+        "importance": importance,
+        "examples": [],
+        "recommended_fix": recommended_fix,
+        "citation": citation,
+        "confidence": confidence
+    }
+
+# Fallback rules with everything but rule_id (and the confidentiality explanation) fixed
+_TEMPLATES = {
+    # --- Confidentiality ---
+    "conf_short": _template("Confidentiality Term","Confidentiality obligations must last for at least 3 years.",
+                            None,"MEDIUM",1.0,"Confidentiality shall last 3 years.","SECTION",0.9),
+    "conf_ok": _template("Confidentiality Term","Confidentiality obligations must last for at least 3 years.",
+                         None,"LOW",0.8,"Confidentiality shall last 3 years.","SECTION",0.9),
+    "conf_missing": _template("Confidentiality Term","Confidentiality obligations must last for at least 3 years.",
+                              "No confidentiality duration found.","MEDIUM",1.0,
+                              "Confidentiality shall last 3 years.","SECTION",0.75),
+    # --- Liability Cap ---
+    "liability_ok": _template("Liability Cap","Liability cap must not exceed 1.5x the total fees paid.",
+                              "Liability seems compliant.","LOW",1.0,"Liability limited to 1.5x fees.","SECTION",0.85),
+    "liability_uncapped": _template("Liability Cap","Liability cap must not exceed 1.5x total fees.",
+                                    "No explicit numeric cap found.","HIGH",1.5,"Liability limited to 1.5x fees.","SECTION",0.8),
+    "liability_missing": _template("Liability Cap","Liability cap must not exceed 1.5x total fees.",
+                                   "No liability clause found.","HIGH",1.5,"Liability limited to 1.5x fees.","SECTION",0.75),
+    # --- Data Sale ---
+    "data_sale": _template("Data Sale Prohibition","Provider must not sell Client Data.",
+                           "Data may be sold.","HIGH",1.5,
+                           "Provider shall not sell client data.","SECTION",0.9),
+    "no_data_sale": _template("Data Sale Prohibition","Provider must not sell Client Data.",
+                              "No data sale found.","LOW",0.8,
+                              "Provider shall not sell client data.","SECTION",0.7),
+    # --- Security ---
+    "security_ok": _template("Security Responsibility","Provider must protect client data.",
+                             "Some security text found.","LOW",1.0,"Provider must secure data.","SECTION",0.8),
+    "security_missing": _template("Security Responsibility","Provider must protect client data.",
+                                  "No security terms found.","HIGH",1.5,"Provider must secure data.","SECTION",0.85),
+    # --- Governing Law ---
+    "law_ok": _template("Governing Law Validity","Agreement must specify valid jurisdiction.",
+                        "Governing law exists.","LOW",1.0,"Use proper jurisdiction.","SECTION",0.8),
+    "law_missing": _template("Governing Law Validity","Agreement must specify valid jurisdiction.",
+                             "No governing law found.","HIGH",1.5,"Agreement must specify governing law.","SECTION",0.85),
+}
+
+def _fast_id() -> str:
+    """8 hex chars, like uuid.uuid4().hex[:8], from a single urandom read."""
+    return os.urandom(4).hex()
+
+@functools.lru_cache(maxsize=128)
+def _deterministic_rules(key: _TextDigest) -> Tuple[Tuple[str, Optional[str]], ...]:
+    """(template key, explanation override) per fallback rule for a joined contract text; cached per text digest."""
+    full_text = key.data
+    key.data = None  # the cache keeps the key; don't keep the contract text alive with it
+    rules = []
 
     # --- Confidentiality ---
-    m = re.search(r'confidenti.*?(\d+)\s*years?', full_text)
+    m = _CONF_RE.search(full_text)
     if m:
         years = int(m.group(1))
         if years < 3:
-            add_rule("Confidentiality Term","Confidentiality obligations must last for at least 3 years.",
-                      f"Found confidentiality duration {years} years.",
-                      "MEDIUM",1.0,"Confidentiality shall last 3 years.","SECTION",0.9)
+            rules.append(("conf_short", f"Found confidentiality duration {years} years."))
         else:
-            add_rule("Confidentiality Term","Confidentiality obligations must last for at least 3 years.",
-                      f"Found confidentiality {years} years (OK).",
-                      "LOW",0.8,"Confidentiality shall last 3 years.","SECTION",0.9)
+            rules.append(("conf_ok", f"Found confidentiality {years} years (OK)."))
     else:
-        add_rule("Confidentiality Term","Confidentiality obligations must last for at least 3 years.",
-                 "No confidentiality duration found.","MEDIUM",1.0,
-                 "Confidentiality shall last 3 years.","SECTION",0.75)
+        rules.append(("conf_missing", None))
 
     # --- Liability Cap ---
-    if "liability" in full_text:
-        if "1.5" in full_text or "1.5x" in full_text:
-            add_rule("Liability Cap","Liability cap must not exceed 1.5x the total fees paid.",
-                     "Liability seems compliant.","LOW",1.0,"Liability limited to 1.5x fees.","SECTION",0.85)
-        else:
-            add_rule("Liability Cap","Liability cap must not exceed 1.5x total fees.",
-                     "No explicit numeric cap found.","HIGH",1.5,"Liability limited to 1.5x fees.","SECTION",0.8)
+    if _LIABILITY_RE.search(full_text):
+        # compared as numbers, so "1.5x" and "1.50" count but "$11.55" or "21.5" don't
+        capped = any(float(m.group(1)) == 1.5 for m in _NUM_RE.finditer(full_text))
+        rules.append(("liability_ok" if capped else "liability_uncapped", None))
     else:
-        add_rule("Liability Cap","Liability cap must not exceed 1.5x total fees.",
-                 "No liability clause found.","HIGH",1.5,"Liability limited to 1.5x fees.","SECTION",0.75)
+        rules.append(("liability_missing", None))
 
     # --- Data Sale ---
-    if "sell" in full_text or "commercial" in full_text:
-        add_rule("Data Sale Prohibition","Provider must not sell Client Data.",
-                 "Data may be sold.","HIGH",1.5,
-                 "Provider shall not sell client data.","SECTION",0.9)
-    else:
-        add_rule("Data Sale Prohibition","Provider must not sell Client Data.",
-                 "No data sale found.","LOW",0.8,
-                 "Provider shall not sell client data.","SECTION",0.7)
+    rules.append(("data_sale" if _DATA_SALE_RE.search(full_text) else "no_data_sale", None))
 
     # --- Security ---
-    if "encrypt" in full_text or "security" in full_text:
-        add_rule("Security Responsibility","Provider must protect client data.",
-                 "Some security text found.","LOW",1.0,"Provider must secure data.","SECTION",0.8)
-    else:
-        add_rule("Security Responsibility","Provider must protect client data.",
-                 "No security terms found.","HIGH",1.5,"Provider must secure data.","SECTION",0.85)
+    rules.append(("security_ok" if _SECURITY_RE.search(full_text) else "security_missing", None))
 
     # --- Governing Law ---
-    if "governed by" in full_text:
-        add_rule("Governing Law Validity","Agreement must specify valid jurisdiction.",
-                 "Governing law exists.","LOW",1.0,"Use proper jurisdiction.","SECTION",0.8)
-    else:
-        add_rule("Governing Law Validity","Agreement must specify valid jurisdiction.",
-                 "No governing law found.","HIGH",1.5,"Agreement must specify governing law.","SECTION",0.85)
+    rules.append(("law_ok" if _GOVERNING_LAW_RE.search(full_text) else "law_missing", None))
 
+    return tuple(rules)
+
+def _deterministic_policy_from_chunks(chunks: List[Dict[str, Any]], source_doc: str) -> Dict[str, Any]:
+    """Heuristic risk-policy generator used when Gemini fails."""
+    key = _TextDigest("\n\n".join(c.get("text", "") for c in chunks))
+    # shallow template copies stamped with a fresh rule_id (and examples list)
+    rules = []
+    for name, explanation in _deterministic_rules(key):
+        r = _TEMPLATES[name].copy()
+        r["rule_id"] = _fast_id()
+        if explanation is not None:
+            r["explanation"] = explanation
+        r["examples"] = []
+        rules.append(r)
+
+    generated_at, stamp = _now_strings()
     return {
-        "policy_id": f"POLICY-{datetime.datetime.utcnow().strftime('%Y%m%d%H%M%S')}",
+        "policy_id": f"POLICY-{stamp}",
         "source_document": source_doc,
-        "generated_at": _now_iso(),
+        "generated_at": generated_at,
         "rules": rules,
         "summary": "Generated using deterministic fallback (Gemini unavailable).",
         "metadata": {"generator": "fallback"}
@@ -162,15 +277,72 @@ def _deterministic_policy_from_chunks(chunks: List[Dict[str, Any]], source_doc:
 # -------------------------------------------------------
 # Gemini call (FINAL FIXED VERSION)
 # -------------------------------------------------------
-def _call_gemini(prompt: str, max_retries: int = 3) -> str:
-    """
-    Dynamically select a supported Gemini model and call it.
-    Tries, in order:
-      - genai.GenerativeModel(...).generate_content (with application/json)
-      - genai.generate_content(...)
-      - genai.generate(...)
-    Falls back to deterministic behavior via exceptions so caller can handle it.
+# Last model that answered, as (API key hash, model name). It is tried first on
+# the next call instead of walking the candidate list from the top, and is
+# kept on disk so new processes start with it too.
+_GOOD_MODEL: Optional[Tuple[str, str]] = None
+_GOOD_MODEL_PATH = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+                                "legal-risk", "good_model")
+
+def _key_hash(key: str) -> str:
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+def _model_name(m) -> Optional[str]:
+    try:
+        return getattr(m, "name", None) or getattr(m, "model", None) or str(m)
+    except Exception:
+        return None
+
+def _candidate_names(available) -> List[str]:
+    """Env model, safe defaults, then discovered model names; deduplicated, in that order."""
+    # dict.fromkeys keeps first occurrences in order: one O(n) pass instead of
+    # a list-membership test per discovered model
+    return list(dict.fromkeys(filter(None, [
+        os.getenv("GEMINI_MODEL"),
+        # common safe defaults (no 'models/' prefix)
+        "gemini-1.5-flash", "gemini-1.5-pro", "gemini-1.5-flash-8b", "gemini-pro", "gemini",
+        # names discovered from API (prefer explicit .name attributes)
+        *(_model_name(m) for m in available),
+    ])))
+
+@functools.lru_cache(maxsize=8)
+def _discover_candidates(key_hash: str) -> Tuple[str, ...]:
+    """Candidate model names for the configured key; list_models() runs once per key per process.
+
+    A failing list_models() raises, so failures are not cached.
     """
+    import google.generativeai as genai
+    return tuple(_candidate_names(list(genai.list_models())))
+
+def _good_model(key_hash: str) -> Optional[str]:
+    global _GOOD_MODEL
+    if _GOOD_MODEL is None:
+        try:
+            with open(_GOOD_MODEL_PATH, "r", encoding="utf-8") as f:
+                saved_hash, _, saved_model = f.read().strip().partition(" ")
+            if saved_hash and saved_model:
+                _GOOD_MODEL = (saved_hash, saved_model)
+        except Exception:
+            pass
+    if _GOOD_MODEL is not None and _GOOD_MODEL[0] == key_hash:
+        return _GOOD_MODEL[1]
+    return None
+
+def _mark_good_model(key_hash: str, model_name: str, text: str) -> str:
+    """Record model_name as the last model that answered for this key; returns text unchanged."""
+    global _GOOD_MODEL
+    if _GOOD_MODEL != (key_hash, model_name):
+        _GOOD_MODEL = (key_hash, model_name)
+        try:
+            os.makedirs(os.path.dirname(_GOOD_MODEL_PATH), exist_ok=True)
+            with open(_GOOD_MODEL_PATH, "w", encoding="utf-8") as f:
+                f.write(f"{key_hash} {model_name}\n")
+        except Exception:
+            pass  # the on-disk copy is only a hint
+    return text
+
+def _gemini_candidates():
+    """Configure google.generativeai and return (genai, candidate model names in try order, key hash)."""
     try:
         import google.generativeai as genai
     except Exception as e:
@@ -181,53 +353,68 @@ def _call_gemini(prompt: str, max_retries: int = 3) -> str:
     if not key:
         raise RuntimeError("GEMINI_API_KEY or GOOGLE_API_KEY not set in environment.")
     genai.configure(api_key=key)
+    key_hash = _key_hash(key)
 
     # Try to discover usable models
     try:
-        available = genai.list_models()
+        candidates = list(_discover_candidates(key_hash))
     except Exception as e:
         # If listing fails, fall back to environment model name or default
-        available = []
         print("⚠ Warning: list_models() failed:", e)
-
-    # Build a list of candidate model names (from env var + discovered models)
-    candidates = []
-    env_model = os.getenv("GEMINI_MODEL")
-    if env_model:
-        candidates.append(env_model)
-    # common safe defaults (no 'models/' prefix)
-    candidates.extend(["gemini-1.5-flash", "gemini-1.5-pro", "gemini-1.5-flash-8b", "gemini-pro", "gemini"])
-    # add names discovered from API (prefer explicit .name attributes)
-    for m in available:
-        try:
-            name = getattr(m, "name", None) or getattr(m, "model", None) or str(m)
-            if name and name not in candidates:
-                candidates.append(name)
-        except Exception:
-            continue
-
-    # Deduplicate while preserving order
-    seen = set()
-    candidates = [c for c in candidates if c and not (c in seen or seen.add(c))]
+        candidates = _candidate_names([])
+
+    return genai, _prefer_good_model(candidates, key_hash), key_hash
+
+def _prefer_good_model(candidates: List[str], key_hash: str) -> List[str]:
+    """candidates with the model that answered last time for this key moved to the front."""
+    good = _good_model(key_hash)
+    if good and (not candidates or candidates[0] != good):
+        return [good] + [c for c in candidates if c != good]
+    return candidates
+
+def _response_text(out) -> str:
+    """Text of the first candidate of a generate_content response."""
+    if hasattr(out, "candidates") and out.candidates:
+        cand = out.candidates[0]
+        content = getattr(cand, "content", None) or getattr(cand, "text", None)
+        if isinstance(content, (dict, list)):
+            return json.dumps(content)
+        if isinstance(content, str):
+            return content
+    return str(out)
+
+def _backoff_delay(attempt: int, deadline: float) -> float:
+    """Full-jitter exponential backoff, never sleeping past the deadline."""
+    return max(0.0, min(deadline - time.monotonic(), random.uniform(0, 2 ** attempt)))
+
+def _call_gemini(prompt: str, max_retries: int = 3, overall_timeout: float = 120.0) -> str:
+    """
+    Dynamically select a supported Gemini model and call it.
+    Tries, in order:
+      - genai.GenerativeModel(...).generate_content (with application/json)
+      - genai.generate_content(...)
+      - genai.generate(...)
+    All models and retries share one overall_timeout budget; once it is spent
+    no further attempts are started.
+    Falls back to deterministic behavior via exceptions so caller can handle it.
+    """
+    deadline = time.monotonic() + overall_timeout
+    genai, candidates, key_hash = _gemini_candidates()
 
     last_err = None
     for model_name in candidates:
+        if time.monotonic() >= deadline:
+            break
         for attempt in range(max_retries):
+            if time.monotonic() >= deadline:
+                break
             try:
                 print(f"➡ Trying model: {model_name} (attempt {attempt+1}/{max_retries})")
                 # Preferred path: modern GenerativeModel wrapper
                 if hasattr(genai, "GenerativeModel"):
                     try:
                         gm = genai.GenerativeModel(model_name, generation_config={"response_mime_type": "application/json"})
-                        out = gm.generate_content(prompt)
-                        if hasattr(out, "candidates") and out.candidates:
-                            cand = out.candidates[0]
-                            content = getattr(cand, "content", None) or getattr(cand, "text", None)
-                            if isinstance(content, (dict, list)):
-                                return json.dumps(content)
-                            if isinstance(content, str):
-                                return content
-                        return str(out)
+                        return _mark_good_model(key_hash, model_name, _response_text(gm.generate_content(prompt)))
                     except Exception as e_gm:
                         # If the model doesn't support generate_content or model is invalid, try other fallbacks
                         last_err = e_gm
@@ -239,34 +426,18 @@ def _call_gemini(prompt: str, max_retries: int = 3) -> str:
                             # try text/plain instead
                             try:
                                 gm2 = genai.GenerativeModel(model_name, generation_config={"response_mime_type": "text/plain"})
-                                out2 = gm2.generate_content(prompt)
-                                if hasattr(out2, "candidates") and out2.candidates:
-                                    cand2 = out2.candidates[0]
-                                    content2 = getattr(cand2, "content", None) or getattr(cand2, "text", None)
-                                    if isinstance(content2, (dict, list)):
-                                        return json.dumps(content2)
-                                    if isinstance(content2, str):
-                                        return content2
-                                return str(out2)
+                                return _mark_good_model(key_hash, model_name, _response_text(gm2.generate_content(prompt)))
                             except Exception as e2:
                                 last_err = e2
                                 break
                         # otherwise retry with backoff
-                        time.sleep(1.0 * (2 ** attempt))
+                        time.sleep(_backoff_delay(attempt, deadline))
                         continue
 
                 # Secondary: genai.generate_content function (older SDK)
                 if hasattr(genai, "generate_content"):
                     try:
-                        out = genai.generate_content(model=model_name, prompt=prompt, response_mime_type="application/json")
-                        if hasattr(out, "candidates") and out.candidates:
-                            cand = out.candidates[0]
-                            content = getattr(cand, "content", None) or getattr(cand, "text", None)
-                            if isinstance(content, (dict, list)):
-                                return json.dumps(content)
-                            if isinstance(content, str):
-                                return content
-                        return str(out)
+                        return _mark_good_model(key_hash, model_name, _response_text(genai.generate_content(model=model_name, prompt=prompt, response_mime_type="application/json")))
                     except Exception as e_gc:
                         last_err = e_gc
                         errstr = str(e_gc).lower()
@@ -276,19 +447,11 @@ def _call_gemini(prompt: str, max_retries: int = 3) -> str:
                         if "mime" in errstr:
                             # try text/plain
                             try:
-                                out2 = genai.generate_content(model=model_name, prompt=prompt, response_mime_type="text/plain")
-                                if hasattr(out2, "candidates") and out2.candidates:
-                                    cand2 = out2.candidates[0]
-                                    content2 = getattr(cand2, "content", None) or getattr(cand2, "text", None)
-                                    if isinstance(content2, (dict, list)):
-                                        return json.dumps(content2)
-                                    if isinstance(content2, str):
-                                        return content2
-                                return str(out2)
+                                return _mark_good_model(key_hash, model_name, _response_text(genai.generate_content(model=model_name, prompt=prompt, response_mime_type="text/plain")))
                             except Exception as e2:
                                 last_err = e2
                                 break
-                        time.sleep(1.0 * (2 ** attempt))
+                        time.sleep(_backoff_delay(attempt, deadline))
                         continue
 
                 # Tertiary: older .generate API
@@ -299,15 +462,15 @@ def _call_gemini(prompt: str, max_retries: int = 3) -> str:
                             cand = out.candidates[0]
                             txt = getattr(cand, "content", None) or getattr(cand, "text", None)
                             if isinstance(txt, str):
-                                return txt
-                        return str(out)
+                                return _mark_good_model(key_hash, model_name, txt)
+                        return _mark_good_model(key_hash, model_name, str(out))
                     except Exception as e_gen:
                         last_err = e_gen
                         errstr = str(e_gen).lower()
                         if "not found" in errstr or "404" in errstr:
                             print(f"   ✖ Model {model_name} not found for generate.")
                             break
-                        time.sleep(1.0 * (2 ** attempt))
+                        time.sleep(_backoff_delay(attempt, deadline))
                         continue
 
                 # If we reached here, couldn't call any method on genai for this model; continue to next
@@ -316,21 +479,145 @@ def _call_gemini(prompt: str, max_retries: int = 3) -> str:
             except Exception as outer_e:
                 last_err = outer_e
                 # small backoff then retry
-                time.sleep(1.0 * (2 ** attempt))
+                time.sleep(_backoff_delay(attempt, deadline))
                 continue
 
     # If nothing returned by now, raise helpful error including last exception and candidate list
     candidate_list = ", ".join(candidates)
+    if time.monotonic() >= deadline:
+        raise RuntimeError(f"Gemini call gave up after {overall_timeout:.0f}s (candidates: {candidate_list}). Last error: {last_err}")
+    raise RuntimeError(f"No usable Gemini model found among candidates: {candidate_list}. Last error: {last_err}")
+
+async def _call_gemini_async(prompt: str, max_retries: int = 3, timeout: float = 30.0,
+                             overall_timeout: float = 120.0, gemini=None) -> str:
+    """
+    Async counterpart of _call_gemini for concurrent policy generation.
+    Same candidate order, retries, not-found / mime handling and overall
+    budget, but only the GenerativeModel path (the older module-level APIs
+    have no async variant), with each attempt bounded by timeout seconds.
+    gemini is a (genai, candidates, key_hash) result of _gemini_candidates
+    shared by concurrent calls; it is resolved here when not given.
+    """
+    deadline = time.monotonic() + overall_timeout
+    if gemini is None:
+        # model discovery (list_models) is a blocking RPC; keep it off the event loop
+        gemini = await asyncio.to_thread(_gemini_candidates)
+    genai, candidates, key_hash = gemini
+    # a concurrent call may have found a working model since candidates were resolved
+    candidates = _prefer_good_model(candidates, key_hash)
+    if not hasattr(genai, "GenerativeModel"):
+        raise RuntimeError("google-generativeai is too old for async calls (no GenerativeModel).")
+
+    last_err = None
+    for model_name in candidates:
+        if time.monotonic() >= deadline:
+            break
+        for attempt in range(max_retries):
+            if time.monotonic() >= deadline:
+                break
+            print(f"➡ Trying model: {model_name} (attempt {attempt+1}/{max_retries})")
+            try:
+                gm = genai.GenerativeModel(model_name, generation_config={"response_mime_type": "application/json"})
+                out = await asyncio.wait_for(gm.generate_content_async(prompt),
+                                             timeout=max(0.0, min(timeout, deadline - time.monotonic())))
+                return _mark_good_model(key_hash, model_name, _response_text(out))
+            except Exception as e_gm:
+                last_err = e_gm
+                errstr = str(e_gm).lower()
+                if "not found" in errstr or "404" in errstr:
+                    print(f"   ✖ Model {model_name} not found or unsupported for this key.")
+                    break
+                if "mime" in errstr or "mimetype" in errstr:
+                    try:
+                        gm2 = genai.GenerativeModel(model_name, generation_config={"response_mime_type": "text/plain"})
+                        out2 = await asyncio.wait_for(gm2.generate_content_async(prompt),
+                                                      timeout=max(0.0, min(timeout, deadline - time.monotonic())))
+                        return _mark_good_model(key_hash, model_name, _response_text(out2))
+                    except Exception as e2:
+                        last_err = e2
+                        break
+                await asyncio.sleep(_backoff_delay(attempt, deadline))
+
+    candidate_list = ", ".join(candidates)
+    if time.monotonic() >= deadline:
+        raise RuntimeError(f"Gemini call gave up after {overall_timeout:.0f}s (candidates: {candidate_list}). Last error: {last_err}")
     raise RuntimeError(f"No usable Gemini model found among candidates: {candidate_list}. Last error: {last_err}")
 
+# -------------------------------------------------------
+# Gemini batch job (one submission for many prompts)
+# -------------------------------------------------------
+_BATCH_DONE_STATES = {"JOB_STATE_SUCCEEDED", "JOB_STATE_FAILED", "JOB_STATE_CANCELLED", "JOB_STATE_EXPIRED"}
+
+def _call_gemini_batch(prompts: List[str], poll_interval: float = 10.0, timeout: float = 600.0) -> List[Optional[str]]:
+    """
+    Submit all prompts as one Gemini batch job and wait up to timeout seconds for it.
+    Returns one raw response text per prompt (None where that request failed).
+    Raises if the batch API is unavailable or the job does not succeed, so the
+    caller can fall back to per-prompt _call_gemini. A job that is still
+    running when this gives up (timeout, error, interrupt) is cancelled, so
+    the fallback does not pay for the same prompts twice.
+    """
+    try:
+        from google import genai
+    except Exception as e:
+        raise RuntimeError("google-genai not installed (needed for batch jobs). Run: pip install google-genai") from e
+
+    key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
+    if not key:
+        raise RuntimeError("GEMINI_API_KEY or GOOGLE_API_KEY not set in environment.")
+    client = genai.Client(api_key=key)
+
+    requests = [{
+        "contents": [{"role": "user", "parts": [{"text": p}]}],
+        "config": {"response_mime_type": "application/json"},
+    } for p in prompts]
+    job = client.batches.create(model=GEMINI_MODEL, src=requests,
+                                config={"display_name": f"policy-batch-{uuid.uuid4().hex[:8]}"})
+    print(f"➡ Submitted Gemini batch job {job.name} ({len(prompts)} requests)")
+
+    deadline = time.monotonic() + timeout
+    state = getattr(job.state, "name", str(job.state))
+    try:
+        while state not in _BATCH_DONE_STATES:
+            if time.monotonic() >= deadline:
+                raise RuntimeError(f"Batch job {job.name} still {state} after {timeout:.0f}s")
+            time.sleep(max(0.0, min(poll_interval, deadline - time.monotonic())))
+            job = client.batches.get(name=job.name)
+            state = getattr(job.state, "name", str(job.state))
+    finally:
+        if state not in _BATCH_DONE_STATES:
+            try:
+                client.batches.cancel(name=job.name)
+                print(f"   ✖ Cancelled Gemini batch job {job.name}")
+            except Exception as e:
+                print(f"⚠ Warning: could not cancel batch job {job.name}:", e)
+    if state != "JOB_STATE_SUCCEEDED":
+        raise RuntimeError(f"Batch job {job.name} ended in {state}: {getattr(job, 'error', None)}")
+
+    # inline responses come back in request order
+    inlined = list(getattr(job.dest, "inlined_responses", None) or [])
+    if len(inlined) != len(prompts):
+        raise RuntimeError(f"Batch job {job.name} returned {len(inlined)} responses for {len(prompts)} requests")
+    raws = []
+    for item in inlined:
+        resp = getattr(item, "response", None)
+        if resp is None or getattr(item, "error", None):
+            raws.append(None)
+            continue
+        try:
+            raws.append(resp.text)
+        except Exception:
+            raws.append(None)
+    return raws
+
 # -------------------------------------------------------
 # Entry point for generator
 # -------------------------------------------------------
-def generate_policy_from_chunks(chunks, source_doc, use_model=False, top_k=5):
-    """Generate full policy JSON using Gemini or fallback."""
+def _build_prompt(chunks, top_k=5):
+    """Gemini prompt for the first top_k chunks of a document."""
     context = "\n\n---\n\n".join(c["text"] for c in chunks[:top_k])
 
-    prompt = f"""
+    return f"""
 You are a legal policy generator. Produce STRICT JSON ONLY.
 
 Schema:
@@ -362,18 +649,76 @@ Contract excerpts:
 Return ONLY valid JSON.
 """
 
+def _finish_model_policy(parsed, source_doc):
+    """Fill in the top-level fields a model response may have left out."""
+    parsed.setdefault("policy_id", f"POLICY-{uuid.uuid4().hex[:8]}")
+    parsed.setdefault("source_document", source_doc)
+    parsed.setdefault("generated_at", _now_iso())
+    parsed.setdefault("metadata", {"generator": "gemini"})
+    return parsed
+
+def generate_policy_from_chunks(chunks, source_doc, use_model=False, top_k=5):
+    """Generate full policy JSON using Gemini or fallback."""
     if use_model:
         try:
-            raw = _call_gemini(prompt)
+            raw = _call_gemini(_build_prompt(chunks, top_k))
             parsed = _extract_json_from_text(raw)
 
             if parsed:
-                parsed.setdefault("policy_id", f"POLICY-{uuid.uuid4().hex[:8]}")
-                parsed.setdefault("source_document", source_doc)
-                parsed.setdefault("generated_at", _now_iso())
-                parsed.setdefault("metadata", {"generator": "gemini"})
+                return _finish_model_policy(parsed, source_doc)
 
-                return parsed
+            print("⚠ Gemini returned non-JSON. Falling back.")
+        except Exception as e:
+            print("Model failed. Falling back:", e)
+
+    return _deterministic_policy_from_chunks(chunks, source_doc)
+
+def generate_policies_batch(docs, use_model=False, top_k=5, poll_interval=10.0, batch_timeout=600.0):
+    """
+    Generate one policy per (chunks, source_doc) pair.
+
+    With use_model, all prompts go to Gemini as a single batch job instead of
+    one generate_content round trip per document; the job is polled every
+    poll_interval seconds for up to batch_timeout seconds, then cancelled.
+    Documents whose batch response is missing or not JSON (or all of them,
+    if the batch job cannot be run) go through generate_policy_from_chunks
+    one at a time.
+    """
+    docs = list(docs)
+    raws = [None] * len(docs)
+    if use_model and docs:
+        try:
+            raws = _call_gemini_batch([_build_prompt(chunks, top_k) for chunks, _ in docs],
+                                      poll_interval=poll_interval, timeout=batch_timeout)
+        except Exception as e:
+            print("Batch request failed. Falling back to per-document calls:", e)
+
+    policies = []
+    for (chunks, source_doc), raw in zip(docs, raws):
+        parsed = _extract_json_from_text(raw) if raw else None
+        if parsed:
+            policies.append(_finish_model_policy(parsed, source_doc))
+        else:
+            policies.append(generate_policy_from_chunks(chunks, source_doc, use_model=use_model, top_k=top_k))
+    return policies
+
+async def generate_policy_from_chunks_async(chunks, source_doc, use_model=False, top_k=5):
+    """Async generate_policy_from_chunks; the Gemini call does not block the event loop."""
+    return await _policy_from_chunks_async(chunks, source_doc, use_model, top_k)
+
+async def _policy_from_chunks_async(chunks, source_doc, use_model, top_k, gemini=None, limit=None):
+    # limit (a semaphore) bounds the model calls in flight across documents
+    if use_model:
+        try:
+            if limit is None:
+                raw = await _call_gemini_async(_build_prompt(chunks, top_k), gemini=gemini)
+            else:
+                async with limit:
+                    raw = await _call_gemini_async(_build_prompt(chunks, top_k), gemini=gemini)
+            parsed = _extract_json_from_text(raw)
+
+            if parsed:
+                return _finish_model_policy(parsed, source_doc)
 
             print("⚠ Gemini returned non-JSON. Falling back.")
         except Exception as e:
@@ -381,9 +726,67 @@ Return ONLY valid JSON.
 
     return _deterministic_policy_from_chunks(chunks, source_doc)
 
+async def generate_policies_async(docs, use_model=False, top_k=5, max_concurrency=8):
+    """
+    Generate one policy per (chunks, source_doc) pair, with up to
+    max_concurrency model calls in flight at once (bounded by provider QPS).
+    Model discovery runs once for the whole set.
+    """
+    docs = list(docs)
+    gemini = None
+    if use_model and docs:
+        try:
+            gemini = await asyncio.to_thread(_gemini_candidates)
+        except Exception as e:
+            print("Model failed. Falling back:", e)
+            use_model = False
+    limit = asyncio.Semaphore(max(1, max_concurrency))
+    results = await asyncio.gather(
+        *(_policy_from_chunks_async(chunks, source_doc, use_model, top_k, gemini=gemini, limit=limit)
+          for chunks, source_doc in docs),
+        return_exceptions=True)
+    return [r if not isinstance(r, BaseException) else _deterministic_policy_from_chunks(chunks, source_doc)
+            for r, (chunks, source_doc) in zip(results, docs)]
+
+def generate_policies(docs, use_model=False, top_k=5, max_concurrency=8):
+    """Blocking wrapper around generate_policies_async (must not be called from a running event loop)."""
+    return asyncio.run(generate_policies_async(docs, use_model=use_model, top_k=top_k,
+                                               max_concurrency=max_concurrency))
+
 # -------------------------------------------------------
 # Save output
 # -------------------------------------------------------
+def _iter_policy_json(policy_obj):
+    """orjson OPT_INDENT_2 output of policy_obj in pieces: one per top-level field and one per rule."""
+    opt = orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY
+    if not isinstance(policy_obj, dict) or not policy_obj:
+        yield orjson.dumps(policy_obj, option=opt)
+        return
+    yield b"{"
+    for i, (k, v) in enumerate(policy_obj.items()):
+        if not isinstance(k, str):
+            raise orjson.JSONEncodeError("Dict key must be str")
+        yield (b",\n  " if i else b"\n  ") + orjson.dumps(k) + b": "
+        if k == "rules" and isinstance(v, list) and v:
+            # the rules array is encoded rule by rule, re-indented to its depth
+            yield b"["
+            for j, rule in enumerate(v):
+                yield (b",\n    " if j else b"\n    ") + orjson.dumps(rule, option=opt).replace(b"\n", b"\n    ")
+            yield b"\n  ]"
+        else:
+            yield orjson.dumps(v, option=opt).replace(b"\n", b"\n  ")
+    yield b"\n}"
+
 def save_policy_json(policy_obj, path):
+    # Written piece by piece, so a policy with many rules is never held as
+    # one formatted buffer (json.dump below streams as well).
+    if orjson is not None:
+        try:
+            with open(path, "wb") as f:
+                for piece in _iter_policy_json(policy_obj):
+                    f.write(piece)
+            return
+        except orjson.JSONEncodeError:
+            pass  # e.g. non-str keys or >64-bit ints; json.dump handles those
     with open(path, "w", encoding="utf-8") as f:
         json.dump(policy_obj, f, indent=2)
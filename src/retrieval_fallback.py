@@ -1,24 +1,75 @@
 # A simple keyword-based "retrieval" used offline.
 
+from collections import Counter
 from typing import List, Dict, Any
+import numpy as np
 
-def retrieve_relevant_chunk(chunks: List[Dict[str, Any]], query: str) -> str:
-    q = query.lower()
-    best = ''
-    best_score = -1
+# Retriever for the most recently queried chunk list: (chunks, retriever).
+# Repeated retrieve_relevant_chunk calls against the same list reuse it instead
+# of rescanning every chunk.
+_last_prepared = None
+
+# Special features and their weights: rows 0 and 1 of every presence matrix
+# ('1.5' also covers '1.5x')
+_BONUS_FEATURES = ('3 year', '1.5')
+_BONUS_WEIGHT = 2
+
+class KeywordRetriever:
+    """Keyword scoring over a fixed chunk list, built once and reused across queries.
+
+    A chunk scores one point per query token (repeats included) that occurs in
+    its lowercased text as a substring, plus 2 each for '3 year' and '1.5'.
+    Presence is kept as a (features x chunks) uint8 matrix: the bonus rows are
+    filled up front and a row per distinct query token is appended on first
+    use. A query is scored with one weighted sum over the rows it selects.
+    """
 
-    for c in chunks:
-        text = c.get('text','').lower()
-        score = sum(tok in text for tok in q.split())
+    def __init__(self, chunks: List[Dict[str, Any]]):
+        self.texts = [c.get('text','') for c in chunks]
+        self.lowered = [t.lower() for t in self.texts]
+        self.vocab = {}  # query token -> row of self.presence
+        self.presence = np.zeros((16, len(self.lowered)), dtype=np.uint8)
+        self.rows = 0
+        self._bonus_rows = [self._row(f) for f in _BONUS_FEATURES]
 
-        # Special weights
-        if '3 year' in text:
-            score += 2
-        if '1.5' in text or '1.5x' in text:
-            score += 2
+    def _row(self, tok: str) -> int:
+        row = self.vocab.get(tok)
+        if row is None:
+            if self.rows == self.presence.shape[0]:
+                grown = np.zeros((2 * self.rows, self.presence.shape[1]), dtype=np.uint8)
+                grown[:self.rows] = self.presence
+                self.presence = grown
+            row = self.rows
+            self.presence[row] = np.fromiter((tok in t for t in self.lowered), dtype=np.uint8, count=len(self.lowered))
+            self.vocab[tok] = row
+            self.rows += 1
+        return row
 
-        if score > best_score:
-            best_score = score
-            best = c.get('text','')
+    def scores(self, query: str) -> np.ndarray:
+        counts = Counter(query.lower().split())
+        rows = self._bonus_rows + [self._row(tok) for tok in counts]
+        weights = np.array([_BONUS_WEIGHT] * len(self._bonus_rows) + list(counts.values()), dtype=np.int32)
+        return weights @ self.presence[rows]
 
-    return best
+    def retrieve(self, query: str) -> str:
+        if not self.texts:
+            return ''
+        # argmax keeps the first chunk among equal scores
+        return self.texts[int(self.scores(query).argmax())]
+
+def _retriever(chunks: List[Dict[str, Any]]) -> KeywordRetriever:
+    global _last_prepared
+    if _last_prepared is not None:
+        last_chunks, retriever = _last_prepared
+        # same list object holding the same text objects -> retriever still valid
+        if last_chunks is chunks and len(retriever.texts) == len(chunks) and \
+                all(a is c.get('text','') for a, c in zip(retriever.texts, chunks)):
+            return retriever
+    retriever = KeywordRetriever(chunks)
+    _last_prepared = (chunks, retriever)
+    return retriever
+
+def retrieve_relevant_chunk(chunks: List[Dict[str, Any]], query: str) -> str:
+    if not chunks:
+        return ''
+    return _retriever(chunks).retrieve(query)